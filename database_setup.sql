@@ -11,7 +11,7 @@ CREATE TABLE customers (
     email VARCHAR(255) NOT NULL UNIQUE,
     first_name TEXT NOT NULL,
     last_name TEXT NOT NULL,
-    plan_type TEXT NOT NULL,
+    plan_type VARCHAR(32) NOT NULL,
     candidate TEXT
 );
 
@@ -19,7 +19,7 @@ CREATE TABLE customers (
 CREATE TABLE page_views (
     id INTEGER PRIMARY KEY AUTO_INCREMENT,
     user_id INTEGER NOT NULL,
-    page TEXT NOT NULL,
+    page VARCHAR(64) NOT NULL,
     device TEXT NOT NULL,
     browser TEXT NOT NULL,
     location TEXT NOT NULL,
@@ -27,6 +27,10 @@ CREATE TABLE page_views (
     FOREIGN KEY (user_id) REFERENCES customers(id)
 );
 
+-- Indexes backing Phase 2 Query 2's per-user latest-view lookup
+CREATE INDEX ix_pv_user_page_time ON page_views(user_id, page, event_time DESC);
+CREATE INDEX ix_cust_plan ON customers(plan_type);
+
 -- ==========================================
 -- Seed Customers Table (15 customers)
 -- ==========================================
@@ -3,18 +3,161 @@ Database Connection Module
 Handles SQL database connections and query execution for Iterable integration
 """
 
-import mysql.connector
-from mysql.connector import Error
-from typing import List, Dict, Any
+from mysql.connector import Error, errors, pooling
+from typing import TYPE_CHECKING, List, Any, Iterator, Iterable, NamedTuple, Optional, Sequence
+from collections import namedtuple
+from contextlib import contextmanager
 import logging
+import queue
+import threading
+
+if TYPE_CHECKING:
+    import polars as pl
 
 logger = logging.getLogger(__name__)
 
+# Phase 2 Query 2: latest pricing/settings view per pro user in the last 7 days
+# Uses a LATERAL top-1 lookup per pro user (MySQL 8.0.14+) so the
+# ix_pv_user_page_time index serves each user directly, instead of
+# ranking the full customers/page_views join with ROW_NUMBER()
+PRO_USERS_RECENT_ENGAGEMENT_QUERY = """
+SELECT 
+    c.id,
+    c.email,
+    c.first_name,
+    c.last_name,
+    c.plan_type,
+    c.candidate,
+    pv.page,
+    pv.device,
+    pv.browser,
+    pv.location,
+    pv.event_time
+FROM customers c
+CROSS JOIN LATERAL (
+    SELECT page, device, browser, location, event_time
+    FROM page_views
+    WHERE page_views.user_id = c.id
+        AND page_views.page IN ('pricing', 'settings')
+        AND page_views.event_time >= DATE_SUB(CURDATE(), INTERVAL 7 DAY)
+    ORDER BY page_views.event_time DESC
+    LIMIT 1
+) AS pv
+WHERE c.plan_type = 'pro'
+ORDER BY pv.event_time DESC;
+"""
+
+
+def _record_type(column_names: Iterable[str]) -> type:
+    """
+    Build a named tuple type for rows with the given columns
+
+    Rows are returned as named tuples rather than dicts: one tuple per row
+    instead of one dict, with cheap attribute access by column name.
+    Columns that are not valid identifiers (e.g. COUNT(*)) or repeat an
+    earlier name (e.g. two joined id columns) are renamed positionally
+    (_0, _1, ...) instead of raising.
+
+    Args:
+        column_names: Column names reported by the cursor
+
+    Returns:
+        namedtuple class named Record
+    """
+    return namedtuple('Record', column_names, rename=True)
+
+
+class PrefetchingIterator:
+    """
+    Iterate rows that a background thread reads ahead in chunks
+
+    The worker thread pulls rows from the source iterator and pushes them in
+    chunks onto a bounded queue, so database reads overlap with whatever the
+    consumer does between rows. The bounded queue applies backpressure when the
+    consumer falls behind.
+    """
+
+    _DONE = object()
+
+    def __init__(self, source: Iterable[NamedTuple], chunk_size: int = 500, max_chunks: int = 2):
+        """
+        Start prefetching rows from source
+
+        Args:
+            source: Row iterator to read ahead (e.g. DatabaseConnection.iter_query)
+            chunk_size: Number of rows handed over per queue item
+            max_chunks: Maximum number of chunks buffered ahead of the consumer
+        """
+        self._source = source
+        self._chunk_size = chunk_size
+        self._queue = queue.Queue(maxsize=max_chunks)
+        self._stopped = threading.Event()
+        self._current: Iterator[NamedTuple] = iter(())
+        self._thread = threading.Thread(target=self._produce, name="db-prefetch", daemon=True)
+        self._thread.start()
+
+    def _put(self, item: Any) -> bool:
+        """Put an item on the queue, giving up if the consumer has stopped"""
+        while not self._stopped.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce(self) -> None:
+        """Worker thread: read rows from source and enqueue them in chunks"""
+        try:
+            chunk = []
+            for row in self._source:
+                chunk.append(row)
+                if len(chunk) >= self._chunk_size:
+                    if not self._put(chunk):
+                        return
+                    chunk = []
+            if chunk:
+                self._put(chunk)
+        except Exception as e:
+            self._put(e)
+        finally:
+            self._put(self._DONE)
+            close = getattr(self._source, 'close', None)
+            if close is not None:
+                close()
+
+    def __iter__(self) -> "PrefetchingIterator":
+        return self
+
+    def __next__(self) -> NamedTuple:
+        while True:
+            row = next(self._current, self._DONE)
+            if row is not self._DONE:
+                return row
+
+            # Stay exhausted once the worker has finished
+            if self._stopped.is_set():
+                raise StopIteration
+
+            item = self._queue.get()
+            if item is self._DONE:
+                self._stopped.set()
+                raise StopIteration
+            if isinstance(item, Exception):
+                self._stopped.set()
+                raise item
+            self._current = iter(item)
+
+    def close(self) -> None:
+        """Stop the worker thread if the consumer stops early"""
+        self._stopped.set()
+        self._thread.join()
+
 
 class DatabaseConnection:
-    """Manages MySQL database connections and queries"""
+    """Manages a pool of MySQL database connections and queries"""
 
-    def __init__(self, host: str, user: str, password: str, database: str):
+    def __init__(self, host: str, user: str, password: str, database: str, pool_size: int = 25):
         """
         Initialize database connection parameters
 
@@ -23,108 +166,248 @@ class DatabaseConnection:
             user: Database username
             password: Database password
             database: Database name
+            pool_size: Number of pooled connections to keep open (max 32)
         """
         self.host = host
         self.user = user
         self.password = password
         self.database = database
-        self.connection = None
+        self.pool_size = pool_size
+        self.pool = None
+        # Counts free pooled connections so callers wait instead of getting PoolError
+        self._free_connections: Optional[threading.BoundedSemaphore] = None
+
+    def __enter__(self) -> "DatabaseConnection":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.disconnect()
 
     def connect(self) -> bool:
         """
-        Establish connection to MySQL database
+        Create a MySQL connection pool and verify it can hand out a connection
 
         Returns:
             bool: True if connection successful, False otherwise
         """
         try:
-            self.connection = mysql.connector.connect(
+            self.pool = pooling.MySQLConnectionPool(
+                pool_name="iterable",
+                pool_size=self.pool_size,
                 host=self.host,
                 user=self.user,
                 password=self.password,
-                database=self.database
+                database=self.database,
+                use_pure=False  # C extension decodes rows much faster than pure Python
             )
-            if self.connection.is_connected():
-                logger.info(f"Successfully connected to database: {self.database}")
-                return True
+            self._free_connections = threading.BoundedSemaphore(self.pool_size)
+            with self.connection() as conn:
+                if conn.is_connected():
+                    logger.info(
+                        "Successfully connected to database: %s (pool size %s)",
+                        self.database, self.pool_size
+                    )
+                    return True
         except Error as e:
-            logger.error(f"Error connecting to database: {e}")
-            return False
+            logger.error("Error connecting to database: %s", e)
+        return False
+
+    @contextmanager
+    def connection(self) -> Iterator[Any]:
+        """
+        Check out a pooled connection, waiting for one to be returned if all are in use
+
+        mysql-connector raises PoolError as soon as the pool is exhausted, so
+        concurrent readers beyond pool_size would fail rather than queue.
+
+        Yields:
+            Pooled MySQL connection, returned to the pool on exit
+        """
+        with self._free_connections:
+            with self.pool.get_connection() as conn:
+                yield conn
 
     def disconnect(self) -> None:
-        """Close database connection"""
-        if self.connection and self.connection.is_connected():
-            self.connection.close()
-            logger.info("Database connection closed")
+        """Close all pooled database connections"""
+        if self.pool:
+            self.pool._remove_connections()
+            self.pool = None
+            logger.info("Database connection pool closed")
+
+    def _fetch_all(self, query: str, params: Optional[Sequence[Any]] = None, prepared: bool = False) -> List[NamedTuple]:
+        """
+        Run a query on a pooled connection and fetch all rows as named tuples
+
+        There is no liveness ping before each query; if the connection turns
+        out to be dead, it is reconnected and the query retried once.
 
-    def execute_query(self, query: str) -> List[Dict[str, Any]]:
+        Args:
+            query: SQL SELECT query to execute
+            params: Values bound to query placeholders
+            prepared: Whether to use a server-side prepared statement
+
+        Returns:
+            List of Record named tuples containing query results
+        """
+        with self.connection() as conn:
+            for attempt in range(2):
+                try:
+                    with conn.cursor(prepared=prepared) as cursor:
+                        cursor.execute(query, params)
+                        record = _record_type(cursor.column_names)
+                        return list(map(record._make, cursor.fetchall()))
+                except errors.OperationalError as e:
+                    if attempt:
+                        raise
+                    logger.warning("Lost database connection (%s), reconnecting", e)
+                    conn.reconnect(attempts=3, delay=1)
+
+    def execute_query(self, query: str) -> List[NamedTuple]:
         """
-        Execute SELECT query and return results as list of dictionaries
+        Execute SELECT query and return results as list of named tuples
 
         Args:
             query: SQL SELECT query to execute
 
         Returns:
-            List of dictionaries containing query results, empty list if error
+            List of Record named tuples containing query results, empty list if error
         """
-        if not self.connection or not self.connection.is_connected():
+        if not self.pool:
             logger.error("Database connection not established")
             return []
 
         try:
-            cursor = self.connection.cursor(dictionary=True)
-            cursor.execute(query)
-            results = cursor.fetchall()
-            cursor.close()
-            logger.info(f"Query executed successfully, returned {len(results)} rows")
+            results = self._fetch_all(query)
+            logger.info("Query executed successfully, returned %s rows", len(results))
             return results
         except Error as e:
-            logger.error(f"Error executing query: {e}")
+            logger.error("Error executing query: %s", e)
             return []
 
-    def get_pro_users_recent_engagement(self) -> List[Dict[str, Any]]:
+    def execute_prepared(self, query: str, params: Sequence[Any] = ()) -> List[NamedTuple]:
+        """
+        Execute a parameterized SELECT query as a server-side prepared statement
+
+        MySQL parses and plans the statement once per connection and binds
+        parameters in binary form, which suits repeated query shapes.
+
+        Args:
+            query: SQL SELECT query with %s placeholders
+            params: Values bound to the placeholders
+
+        Returns:
+            List of Record named tuples containing query results, empty list if error
+        """
+        if not self.pool:
+            logger.error("Database connection not established")
+            return []
+
+        try:
+            results = self._fetch_all(query, params, prepared=True)
+            logger.info("Prepared query executed successfully, returned %s rows", len(results))
+            return results
+        except Error as e:
+            logger.error("Error executing prepared query: %s", e)
+            return []
+
+    def execute_query_df(self, query: str) -> "pl.DataFrame":
+        """
+        Execute SELECT query and load the results into a polars DataFrame
+
+        Requires the optional polars dependency. Rows are decoded into columns
+        in one pass so downstream payload building can run vectorized.
+
+        Args:
+            query: SQL SELECT query to execute
+
+        Returns:
+            polars DataFrame containing query results
+        """
+        import polars as pl
+
+        if not self.pool:
+            logger.error("Database connection not established")
+            return pl.DataFrame()
+
+        try:
+            with self.connection() as conn:
+                df = pl.read_database(query, connection=conn)
+            logger.info("Query executed successfully, returned %s rows", df.height)
+            return df
+        except Error as e:
+            logger.error("Error executing query: %s", e)
+            return pl.DataFrame()
+
+    def iter_query(self, query: str) -> Iterator[NamedTuple]:
+        """
+        Execute SELECT query and stream results one row at a time
+
+        Uses an unbuffered cursor so rows are read from the server as they are
+        consumed instead of materializing the full result set in memory. A pooled
+        connection is held for the lifetime of the iterator.
+
+        Args:
+            query: SQL SELECT query to execute
+
+        Yields:
+            Record named tuples containing query result rows
+        """
+        if not self.pool:
+            logger.error("Database connection not established")
+            return
+
+        row_count = 0
+        try:
+            with self.connection() as conn:
+                cursor = conn.cursor(buffered=False)
+                try:
+                    cursor.execute(query)
+                    make_record = _record_type(cursor.column_names)._make
+                    for row in cursor:
+                        row_count += 1
+                        yield make_record(row)
+                finally:
+                    # Drain rows left unread if the consumer stopped early
+                    if conn.unread_result:
+                        conn.consume_results()
+                    cursor.close()
+            logger.info("Query streamed successfully, returned %s rows", row_count)
+        except Error as e:
+            logger.error("Error executing query: %s", e)
+
+    def get_pro_users_recent_engagement(self) -> List[NamedTuple]:
         """
         Execute Phase 2 Query 2: Get pro plan users with recent pricing/settings page views
         Returns only the latest view per user in the last 7 days
 
         Returns:
-            List of dictionaries with user and page view data
-        """
-        query = """
-        WITH ranked_views AS (
-            SELECT 
-                c.id,
-                c.email,
-                c.first_name,
-                c.last_name,
-                c.plan_type,
-                c.candidate,
-                pv.page,
-                pv.device,
-                pv.browser,
-                pv.location,
-                pv.event_time,
-                ROW_NUMBER() OVER (PARTITION BY c.id ORDER BY pv.event_time DESC) as view_rank
-            FROM customers c
-            INNER JOIN page_views pv ON c.id = pv.user_id
-            WHERE c.plan_type = 'pro'
-                AND pv.page IN ('pricing', 'settings')
-                AND pv.event_time >= DATE_SUB(CURDATE(), INTERVAL 7 DAY)
-        )
-        SELECT 
-            id,
-            email,
-            first_name,
-            last_name,
-            plan_type,
-            candidate,
-            page,
-            device,
-            browser,
-            location,
-            event_time
-        FROM ranked_views
-        WHERE view_rank = 1
-        ORDER BY event_time DESC;
-        """
-        return self.execute_query(query)
+            List of Record named tuples with user and page view data
+        """
+        return self.execute_query(PRO_USERS_RECENT_ENGAGEMENT_QUERY)
+
+    def get_pro_users_recent_engagement_df(self) -> "pl.DataFrame":
+        """
+        Execute Phase 2 Query 2 into a polars DataFrame
+
+        Returns:
+            polars DataFrame with user and page view data
+        """
+        return self.execute_query_df(PRO_USERS_RECENT_ENGAGEMENT_QUERY)
+
+    def iter_pro_users_recent_engagement(self, prefetch: bool = True, batch_size: int = 500) -> Iterator[NamedTuple]:
+        """
+        Stream Phase 2 Query 2 results row by row instead of fetching them all at once
+
+        Args:
+            prefetch: Read rows ahead on a background thread while the caller
+                processes earlier rows
+            batch_size: Rows handed over per prefetched chunk
+
+        Yields:
+            Record named tuples with user and page view data
+        """
+        rows = self.iter_query(PRO_USERS_RECENT_ENGAGEMENT_QUERY)
+        if prefetch:
+            return PrefetchingIterator(rows, chunk_size=batch_size)
+        return rows
+
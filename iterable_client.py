@@ -1,22 +1,91 @@
 """
 Iterable API Client Module
 Handles API calls to Iterable users/update and events/track endpoints
+Provides a synchronous client and an asyncio/httpx (HTTP/2) client with rate limiting
 Includes JWT authentication, retry/backoff logic, and CSV export
 """
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import httpx
+import asyncio
 import logging
 import csv
+import random
 import time
 import jwt
-from typing import Dict, Any, Optional, Tuple, List
+import orjson
+from email.utils import parsedate_to_datetime
+from itertools import islice
+from typing import TYPE_CHECKING, Dict, Any, Iterable, Iterator, NamedTuple, Optional, Tuple, List
 from datetime import datetime
 
+if TYPE_CHECKING:
+    import polars as pl
+
 logger = logging.getLogger(__name__)
 
+# Maximum records accepted per users/bulkUpdate or events/trackBulk call
+BULK_BATCH_SIZE = 1000
 
-class IterableClient:
-    """Client for making API calls to Iterable endpoints with retry logic and JWT support"""
+# HTTP status codes worth retrying: server errors and specific client errors
+_RETRYABLE_CODES = frozenset({408, 429, 500, 502, 503, 504})
+
+# Call outcome for a user the bulk endpoint accepted; shared read-only by all such results
+_BULK_SUCCESS: Dict[str, Any] = {'success': True, 'response': {'bulk': True}}
+
+
+def _format_timestamp(value: Any) -> Optional[str]:
+    """Format a datetime with isoformat(), falling back to str() for other values"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return None if value is None else str(value)
+
+
+def _batched(items: Iterable[Any], batch_size: int) -> Iterator[List[Any]]:
+    """Yield successive lists of at most batch_size items"""
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+class _ExponentialRetry(Retry):
+    """
+    urllib3 Retry that backs off before the first retry too
+
+    Stock urllib3 2.x sleeps 0s before the first retry and backoff_factor * 2**(n-1)
+    after that. This waits backoff_factor * backoff_multiplier**(n-1) from the first
+    retry on, matching BaseIterableClient._calculate_backoff (1s, 2s, 4s, ... by default).
+    """
+
+    backoff_multiplier: float = 2
+
+    def new(self, **kw: Any) -> "_ExponentialRetry":
+        retry = super().new(**kw)
+        retry.backoff_multiplier = self.backoff_multiplier
+        return retry
+
+    def get_backoff_time(self) -> float:
+        # Only consecutive errors count; a redirect resets the schedule
+        consecutive_errors = 0
+        for error in reversed(self.history):
+            if error.redirect_location is not None:
+                break
+            consecutive_errors += 1
+        if consecutive_errors == 0:
+            return 0
+        backoff = self.backoff_factor * (self.backoff_multiplier ** (consecutive_errors - 1))
+        if self.backoff_jitter:
+            backoff += random.random() * self.backoff_jitter
+        return max(0, min(self.backoff_max, backoff))
+
+
+class BaseIterableClient:
+    """Shared configuration, authentication and response handling for Iterable clients"""
 
     def __init__(self, api_key: str = None, jwt_secret: str = None, use_jwt: bool = False, base_url: str = "https://api.iterable.com"):
         """
@@ -33,14 +102,27 @@ class IterableClient:
         self.use_jwt = use_jwt
         self.base_url = base_url.rstrip('/')
         
+        # Endpoint URLs, built once per client
+        self._users_update_url = f"{self.base_url}/api/users/update"
+        self._events_track_url = f"{self.base_url}/api/events/track"
+        self._users_bulk_update_url = f"{self.base_url}/api/users/bulkUpdate"
+        self._events_track_bulk_url = f"{self.base_url}/api/events/trackBulk"
+        
         # Rate limit tracking
         self.users_update_limit = 500  # requests/second
         self.events_track_limit = 2000  # requests/second
+        self.users_bulk_update_limit = 5  # requests/second
+        self.events_track_bulk_limit = 10  # requests/second
         
         # Retry configuration
         self.max_retries = 3
         self.backoff_factor = 2  # Exponential backoff multiplier
         self.initial_backoff = 1  # Initial backoff in seconds
+        self.max_backoff = 30  # Upper bound for backoff growth and server-requested waits, in seconds
+        
+        # Cached JWT token, regenerated only when close to expiry
+        self._jwt_token: Optional[str] = None
+        self._jwt_exp: float = 0
         
         # Setup headers
         self._update_headers()
@@ -65,24 +147,44 @@ class IterableClient:
 
     def _generate_jwt_token(self) -> str:
         """
-        Generate JWT token for Iterable API authentication
+        Return a JWT token for Iterable API authentication
+
+        The signed token is cached and only regenerated within 60s of expiry.
 
         Returns:
             JWT token string
         """
+        if self._jwt_token and time.time() < self._jwt_exp - 60:
+            return self._jwt_token
+
         try:
+            now = int(time.time())
+            exp = now + 3600  # Valid for 1 hour
             payload = {
                 'iss': 'iterable-integration',
-                'iat': int(time.time()),
-                'exp': int(time.time()) + 3600  # Valid for 1 hour
+                'iat': now,
+                'exp': exp
             }
             token = jwt.encode(payload, self.jwt_secret, algorithm='HS256')
+            self._jwt_token = token
+            self._jwt_exp = exp
             logger.debug("JWT token generated successfully")
             return token
         except Exception as e:
-            logger.error(f"Failed to generate JWT token: {e}")
+            logger.error("Failed to generate JWT token: %s", e)
             raise
 
+    def _auth_header(self) -> Dict[str, str]:
+        """
+        Build request headers with a current Authorization header
+
+        Returns:
+            self.headers, with a refreshed Bearer token when using JWT
+        """
+        if self.use_jwt and self.jwt_secret:
+            return {**self.headers, 'Authorization': f'Bearer {self._generate_jwt_token()}'}
+        return self.headers
+
     def _calculate_backoff(self, attempt: int) -> float:
         """
         Calculate exponential backoff time for retry
@@ -93,11 +195,45 @@ class IterableClient:
         Returns:
             Backoff time in seconds
         """
-        backoff_time = self.initial_backoff * (self.backoff_factor ** attempt)
-        # Add jitter (random variation) to prevent thundering herd
-        jitter = backoff_time * 0.1
-        import random
-        return backoff_time + random.uniform(-jitter, jitter)
+        backoff_time = min(self.max_backoff, self.initial_backoff * (self.backoff_factor ** attempt))
+        # Full +/-50% jitter so concurrent retries after a 429 burst spread out
+        return backoff_time * random.uniform(0.5, 1.5)
+
+    def _retry_after_delay(self, headers: Any) -> Optional[float]:
+        """
+        Read the server-requested wait from Retry-After or X-RateLimit-Reset
+
+        Args:
+            headers: Response headers (case-insensitive mapping)
+
+        Returns:
+            Seconds to wait (capped at max_backoff), or None if neither header is usable
+        """
+        retry_after = headers.get('Retry-After')
+        if retry_after:
+            try:
+                delay = float(retry_after)
+            except ValueError:
+                # HTTP-date form
+                try:
+                    delay = parsedate_to_datetime(retry_after).timestamp() - time.time()
+                except (TypeError, ValueError):
+                    delay = None
+            if delay is not None:
+                return min(self.max_backoff, max(0.0, delay))
+        
+        reset = headers.get('X-RateLimit-Reset')
+        if reset:
+            try:
+                delay = float(reset)
+            except ValueError:
+                return None
+            # Epoch seconds when the window resets, or seconds remaining
+            if delay > 1e9:
+                delay -= time.time()
+            return min(self.max_backoff, max(0.0, delay))
+        
+        return None
 
     def _is_retryable(self, status_code: int) -> bool:
         """
@@ -109,62 +245,339 @@ class IterableClient:
         Returns:
             True if request should be retried, False otherwise
         """
-        # Retry on server errors and specific client errors
-        retryable_codes = [408, 429, 500, 502, 503, 504]
-        return status_code in retryable_codes
+        return status_code in _RETRYABLE_CODES
 
-    def _handle_response(self, response: requests.Response, endpoint: str) -> Tuple[bool, Dict[str, Any]]:
+    def _evaluate_response(self, status_code: int, response_data: Dict[str, Any], endpoint: str) -> Tuple[bool, Dict[str, Any]]:
         """
-        Handle API response and distinguish between success and error states
+        Distinguish between success and error states for a parsed API response
 
         Args:
-            response: Response object from requests library
+            status_code: HTTP status code
+            response_data: Parsed JSON response body
             endpoint: Name of endpoint called (for logging)
 
         Returns:
             Tuple of (success: bool, response_data: dict)
         """
-        response_data = {}
-        
-        try:
-            response_data = response.json()
-        except Exception as e:
-            logger.error(f"Failed to parse JSON response from {endpoint}: {e}")
-            response_data = {'raw_response': response.text}
-
         # Check HTTP status code
-        if response.status_code >= 500:
+        if status_code >= 500:
             logger.error(
-                f"5xx Server Error from {endpoint}: Status {response.status_code}\n"
-                f"Response: {response_data}"
+                "5xx Server Error from %s: Status %s\nResponse: %s",
+                endpoint, status_code, response_data
             )
             return False, response_data
-        elif response.status_code >= 400:
+        elif status_code >= 400:
             logger.error(
-                f"4xx Client Error from {endpoint}: Status {response.status_code}\n"
-                f"Response: {response_data}"
+                "4xx Client Error from %s: Status %s\nResponse: %s",
+                endpoint, status_code, response_data
             )
             return False, response_data
-        elif response.status_code >= 200 and response.status_code < 300:
+        elif status_code >= 200 and status_code < 300:
+            # Bulk endpoints report per-record counts instead of a response code
+            if 'code' not in response_data and 'successCount' in response_data:
+                logger.info(
+                    "%s call successful: %s succeeded, %s failed",
+                    endpoint, response_data['successCount'], response_data.get('failCount', 0)
+                )
+                return True, response_data
+
             # Check if response code indicates success
             code = response_data.get('code', 'Unknown')
             if code == 'Success':
-                logger.info(f"{endpoint} call successful: {response_data.get('msg', 'Success')}")
+                logger.info("%s call successful: %s", endpoint, response_data.get('msg', 'Success'))
                 return True, response_data
             else:
                 # HTTP 200 but API error code
                 logger.warning(
-                    f"{endpoint} returned HTTP 200 but error code: {code}\n"
-                    f"Message: {response_data.get('msg', 'No message')}"
+                    "%s returned HTTP 200 but error code: %s\nMessage: %s",
+                    endpoint, code, response_data.get('msg', 'No message')
                 )
                 return False, response_data
         else:
-            logger.warning(f"Unexpected status code from {endpoint}: {response.status_code}")
+            logger.warning("Unexpected status code from %s: %s", endpoint, status_code)
             return False, response_data
 
+    def _new_result(
+        self,
+        email: Optional[str],
+        now_iso: Optional[str] = None,
+        users_update: Optional[Dict[str, Any]] = None,
+        events_track: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Build the processing result for a user record
+
+        Args:
+            email: User email address
+            now_iso: Processing timestamp shared by a batch (default: current time)
+            users_update: users/update outcome (default: not attempted, failed)
+            events_track: events/track outcome (default: not attempted, failed)
+
+        Returns:
+            Dictionary containing processing results and status
+        """
+        users_update = users_update or {'success': False, 'response': {}}
+        events_track = events_track or {'success': False, 'response': {}}
+        return {
+            'email': email,
+            'timestamp': now_iso or datetime.now().isoformat(),
+            'users_update': users_update,
+            'events_track': events_track,
+            'overall_success': users_update['success'] and events_track['success']
+        }
+
+    def _build_user_data_fields(self, user_record: NamedTuple) -> Dict[str, Any]:
+        """
+        Prepare dataFields for users/update from a Phase 2 Query 2 record
+
+        Args:
+            user_record: Record containing user and page view data
+
+        Returns:
+            Dictionary of user profile fields
+        """
+        return {
+            'first_name': user_record.first_name,
+            'last_name': user_record.last_name,
+            'plan_type': user_record.plan_type,
+            'recent_page_view': True,
+            'candidate': user_record.candidate
+        }
+
+    def _build_event_data_fields(self, user_record: NamedTuple) -> Dict[str, Any]:
+        """
+        Prepare dataFields for events/track from a Phase 2 Query 2 record
+
+        Args:
+            user_record: Record containing user and page view data
+
+        Returns:
+            Dictionary of event-specific fields
+        """
+        return {
+            'page': user_record.page,
+            'browser': user_record.device,
+            'location': user_record.location,
+            'timestamp': _format_timestamp(user_record.event_time),
+            'candidate': user_record.candidate
+        }
+
+    def build_record_payloads(self, user_record: NamedTuple) -> Tuple[Optional[str], Dict[str, Any], Dict[str, Any]]:
+        """
+        Build the users/update and events/track dataFields for one record
+
+        Args:
+            user_record: Record containing user and page view data
+
+        Returns:
+            Tuple of (email, user dataFields, event dataFields)
+        """
+        return (
+            user_record.email,
+            self._build_user_data_fields(user_record),
+            self._build_event_data_fields(user_record)
+        )
+
+    def build_bulk_payloads(self, user_records: Iterable[NamedTuple]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Build users/bulkUpdate and events/trackBulk entries in a single pass over the records
+
+        Args:
+            user_records: User records from Phase 2 Query 2
+
+        Returns:
+            Tuple of (user update entries, event entries)
+        """
+        users = []
+        events = []
+        for user_record in user_records:
+            email = user_record.email
+            if not email:
+                logger.error("User record missing email address")
+                continue
+            users.append({
+                'email': email,
+                'dataFields': self._build_user_data_fields(user_record)
+            })
+            events.append({
+                'email': email,
+                'eventName': 'page_view',
+                'dataFields': self._build_event_data_fields(user_record)
+            })
+        return users, events
+
+    def iter_bulk_payloads_df(self, df: "pl.DataFrame", batch_size: int = BULK_BATCH_SIZE) -> Iterator[Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]]:
+        """
+        Build users/bulkUpdate and events/trackBulk entries from a polars DataFrame
+
+        Field renames and constant columns are applied as vectorized column
+        expressions; rows only become dicts per batch, right before sending.
+        Requires the optional polars dependency.
+
+        Args:
+            df: Phase 2 Query 2 results (see DatabaseConnection.execute_query_df)
+            batch_size: Entries per yielded batch
+
+        Yields:
+            Tuples of (user update entries, event entries), one per batch
+        """
+        import polars as pl
+
+        df = df.filter(pl.col('email').is_not_null())
+        users = df.select(
+            pl.col('email'),
+            pl.struct(
+                pl.col('first_name'),
+                pl.col('last_name'),
+                pl.col('plan_type'),
+                pl.lit(True).alias('recent_page_view'),
+                pl.col('candidate')
+            ).alias('dataFields')
+        )
+        events = df.select(
+            pl.col('email'),
+            pl.lit('page_view').alias('eventName'),
+            pl.struct(
+                pl.col('page'),
+                pl.col('device').alias('browser'),
+                pl.col('location'),
+                # Same format as _format_timestamp (datetime.isoformat): microseconds
+                # are included unless they are zero
+                pl.when(pl.col('event_time').dt.microsecond() == 0)
+                .then(pl.col('event_time').dt.strftime('%Y-%m-%dT%H:%M:%S'))
+                .otherwise(pl.col('event_time').dt.strftime('%Y-%m-%dT%H:%M:%S%.6f'))
+                .alias('timestamp'),
+                pl.col('candidate')
+            ).alias('dataFields')
+        )
+        for offset in range(0, df.height, batch_size):
+            yield (
+                users.slice(offset, batch_size).to_dicts(),
+                events.slice(offset, batch_size).to_dicts()
+            )
+
+    def _failed_bulk_emails(self, response_data: Dict[str, Any]) -> set:
+        """
+        Collect the emails a bulk endpoint reported as not updated
+
+        Args:
+            response_data: users/bulkUpdate or events/trackBulk response body
+
+        Returns:
+            Set of failed email addresses
+        """
+        failed = set()
+        for key in ('invalidEmails', 'notFoundEmails'):
+            failed.update(response_data.get(key) or [])
+        for key, emails in (response_data.get('failedUpdates') or {}).items():
+            if key.endswith('Emails'):
+                failed.update(emails or [])
+        return failed
+
+    def _log_result(self, result: Dict[str, Any]) -> None:
+        """
+        Log the overall outcome of processing a user record
+
+        Args:
+            result: Processing result for a single user
+        """
+        if result['overall_success']:
+            logger.info("✓ Successfully processed user: %s", result['email'])
+        else:
+            logger.warning("✗ Partial failure processing user: %s", result['email'])
+
+
+class IterableClient(BaseIterableClient):
+    """Client for making API calls to Iterable endpoints with retry logic and JWT support"""
+
+    def __init__(self, api_key: str = None, jwt_secret: str = None, use_jwt: bool = False, base_url: str = "https://api.iterable.com"):
+        """
+        Initialize Iterable API client
+
+        Args:
+            api_key: Iterable API key for authentication (if not using JWT)
+            jwt_secret: JWT secret for generating authentication tokens
+            use_jwt: Whether to use JWT authentication instead of API key
+            base_url: Base URL for Iterable API (default: https://api.iterable.com)
+        """
+        # Pooled keep-alive session so calls reuse TCP/TLS connections
+        self.session = requests.Session()
+        
+        super().__init__(api_key=api_key, jwt_secret=jwt_secret, use_jwt=use_jwt, base_url=base_url)
+        
+        # Mounted for both schemes so a plain-http base_url (e.g. a local mock
+        # server) gets the same pooling and retries instead of requests' default adapter
+        adapter = HTTPAdapter(max_retries=self._build_retry(), pool_connections=32, pool_maxsize=128)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def _build_retry(self) -> Retry:
+        """
+        Build the urllib3 retry policy from the client's retry configuration
+
+        Returns:
+            Retry mirroring max_retries/initial_backoff/backoff_factor
+        """
+        retry = _ExponentialRetry(
+            total=self.max_retries - 1,  # max_retries counts attempts, urllib3 counts retries
+            backoff_factor=self.initial_backoff,  # Wait before the first retry
+            backoff_jitter=0.1,
+            backoff_max=self.max_backoff,
+            status_forcelist=_RETRYABLE_CODES,
+            allowed_methods=['GET', 'POST'],
+            respect_retry_after_header=True,
+            raise_on_status=False  # Return the last response so _handle_response can log it
+        )
+        retry.backoff_multiplier = self.backoff_factor
+        return retry
+
+    def __enter__(self) -> "IterableClient":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Close the underlying HTTP session and release pooled connections"""
+        self.session.close()
+
+    def _update_headers(self) -> None:
+        """Setup authentication headers and apply them to the pooled session"""
+        super()._update_headers()
+        self.session.headers.update(self.headers)
+
+    def _handle_response(self, response: requests.Response, endpoint: str) -> Tuple[bool, Dict[str, Any]]:
+        """
+        Handle API response and distinguish between success and error states
+
+        Args:
+            response: Response object from requests library
+            endpoint: Name of endpoint called (for logging)
+
+        Returns:
+            Tuple of (success: bool, response_data: dict)
+        """
+        body = response.content
+
+        # Empty 2xx replies carry nothing to inspect
+        if not body and 200 <= response.status_code < 300:
+            return True, {}
+
+        try:
+            response_data = orjson.loads(body) if body else {}
+        except orjson.JSONDecodeError as e:
+            logger.error("Failed to parse JSON response from %s: %s", endpoint, e)
+            response_data = {'raw_response': response.text}
+
+        return self._evaluate_response(response.status_code, response_data, endpoint)
+
     def _make_request_with_retry(self, method: str, endpoint_url: str, payload: Dict[str, Any], endpoint_name: str) -> Tuple[bool, Dict[str, Any]]:
         """
-        Make HTTP request with exponential backoff retry logic
+        Make HTTP request, retried with exponential backoff by the session adapter
+
+        Retries for 408/429/5xx responses, timeouts and connection errors happen
+        inside urllib3 (see _build_retry), honoring Retry-After headers and
+        reusing the pooled connection between attempts.
 
         Args:
             method: HTTP method (POST, GET, etc.)
@@ -175,62 +588,31 @@ class IterableClient:
         Returns:
             Tuple of (success: bool, response_data: dict)
         """
-        last_exception = None
-        last_response = None
-        
-        for attempt in range(self.max_retries):
-            try:
-                logger.debug(f"Attempt {attempt + 1}/{self.max_retries} for {endpoint_name}")
-                
-                if method.upper() == 'POST':
-                    response = requests.post(
-                        endpoint_url,
-                        json=payload,
-                        headers=self.headers,
-                        timeout=10
-                    )
-                else:
-                    response = requests.get(
-                        endpoint_url,
-                        headers=self.headers,
-                        timeout=10
-                    )
-                
-                last_response = response
-                
-                # Check if successful
-                if response.status_code < 400 or not self._is_retryable(response.status_code):
-                    # Either success or non-retryable error
-                    return self._handle_response(response, endpoint_name)
-                
-                # Retryable error - check if we should retry
-                if attempt < self.max_retries - 1:
-                    backoff_time = self._calculate_backoff(attempt)
-                    logger.warning(
-                        f"Retryable error {response.status_code} from {endpoint_name}. "
-                        f"Retrying in {backoff_time:.2f}s (attempt {attempt + 1}/{self.max_retries})"
-                    )
-                    time.sleep(backoff_time)
-                else:
-                    logger.error(f"Max retries reached for {endpoint_name}")
-                    return self._handle_response(response, endpoint_name)
-                    
-            except requests.exceptions.Timeout:
-                last_exception = f"Timeout on attempt {attempt + 1}"
-                logger.warning(f"Timeout from {endpoint_name}. Attempt {attempt + 1}/{self.max_retries}")
-                if attempt < self.max_retries - 1:
-                    backoff_time = self._calculate_backoff(attempt)
-                    time.sleep(backoff_time)
-            except requests.exceptions.RequestException as e:
-                last_exception = str(e)
-                logger.warning(f"Request exception from {endpoint_name}: {e}. Attempt {attempt + 1}/{self.max_retries}")
-                if attempt < self.max_retries - 1:
-                    backoff_time = self._calculate_backoff(attempt)
-                    time.sleep(backoff_time)
-        
-        # All retries exhausted
-        logger.error(f"All {self.max_retries} attempts failed for {endpoint_name}")
-        return False, {'error': last_exception or 'Max retries exceeded'}
+        try:
+            if method.upper() == 'POST':
+                # Pre-encode with orjson; Content-Type comes from self.headers
+                response = self.session.post(
+                    endpoint_url,
+                    data=orjson.dumps(payload),
+                    headers=self._auth_header(),
+                    timeout=10
+                )
+            else:
+                response = self.session.get(
+                    endpoint_url,
+                    headers=self._auth_header(),
+                    timeout=10
+                )
+        except requests.exceptions.Timeout:
+            logger.error("All %s attempts timed out for %s", self.max_retries, endpoint_name)
+            return False, {'error': 'Timeout'}
+        except requests.exceptions.RequestException as e:
+            logger.error("All %s attempts failed for %s: %s", self.max_retries, endpoint_name, e)
+            return False, {'error': str(e)}
+
+        if self._is_retryable(response.status_code):
+            logger.error("Max retries reached for %s", endpoint_name)
+        return self._handle_response(response, endpoint_name)
 
     def update_user(self, email: str, data_fields: Dict[str, Any]) -> Tuple[bool, Dict[str, Any]]:
         """
@@ -243,15 +625,13 @@ class IterableClient:
         Returns:
             Tuple of (success: bool, response_data: dict)
         """
-        endpoint_url = f"{self.base_url}/api/users/update"
-        
         payload = {
             'email': email,
             'dataFields': data_fields
         }
 
-        logger.debug(f"Calling users/update for email: {email}")
-        return self._make_request_with_retry('POST', endpoint_url, payload, 'users/update')
+        logger.debug("Calling users/update for email: %s", email)
+        return self._make_request_with_retry('POST', self._users_update_url, payload, 'users/update')
 
     def track_event(self, email: str, event_name: str, data_fields: Dict[str, Any]) -> Tuple[bool, Dict[str, Any]]:
         """
@@ -265,71 +645,82 @@ class IterableClient:
         Returns:
             Tuple of (success: bool, response_data: dict)
         """
-        endpoint_url = f"{self.base_url}/api/events/track"
-        
         payload = {
             'email': email,
             'eventName': event_name,
             'dataFields': data_fields
         }
 
-        logger.debug(f"Calling events/track for email: {email}, event: {event_name}")
-        return self._make_request_with_retry('POST', endpoint_url, payload, 'events/track')
+        logger.debug("Calling events/track for email: %s, event: %s", email, event_name)
+        return self._make_request_with_retry('POST', self._events_track_url, payload, 'events/track')
+
+    def update_users_bulk(self, records: List[Dict[str, Any]]) -> List[Tuple[bool, Dict[str, Any]]]:
+        """
+        Update many user profiles using users/bulkUpdate, in batches of BULK_BATCH_SIZE
+
+        Args:
+            records: List of {'email': ..., 'dataFields': {...}} entries
+
+        Returns:
+            List of (success: bool, response_data: dict) tuples, one per batch
+        """
+        results = []
+        for batch in _batched(records, BULK_BATCH_SIZE):
+            logger.debug("Calling users/bulkUpdate for %s users", len(batch))
+            results.append(
+                self._make_request_with_retry('POST', self._users_bulk_update_url, {'users': batch}, 'users/bulkUpdate')
+            )
+        return results
 
-    def process_user_record(self, user_record: Dict[str, Any]) -> Dict[str, Any]:
+    def track_events_bulk(self, events: List[Dict[str, Any]]) -> List[Tuple[bool, Dict[str, Any]]]:
+        """
+        Track many events using events/trackBulk, in batches of BULK_BATCH_SIZE
+
+        Args:
+            events: List of {'email': ..., 'eventName': ..., 'dataFields': {...}} entries
+
+        Returns:
+            List of (success: bool, response_data: dict) tuples, one per batch
+        """
+        results = []
+        for batch in _batched(events, BULK_BATCH_SIZE):
+            logger.debug("Calling events/trackBulk for %s events", len(batch))
+            results.append(
+                self._make_request_with_retry('POST', self._events_track_bulk_url, {'events': batch}, 'events/trackBulk')
+            )
+        return results
+
+    def process_user_record(self, user_record: NamedTuple, now_iso: Optional[str] = None) -> Dict[str, Any]:
         """
         Process a single user record by making both users/update and events/track calls
 
         Args:
-            user_record: Dictionary containing user and page view data from Phase 2 Query 2
+            user_record: Record containing user and page view data from Phase 2 Query 2
+            now_iso: Processing timestamp computed once per batch by the caller
 
         Returns:
             Dictionary containing processing results and status
         """
-        email = user_record.get('email')
-        result = {
-            'email': email,
-            'timestamp': datetime.now().isoformat(),
-            'users_update': {'success': False, 'response': {}},
-            'events_track': {'success': False, 'response': {}},
-            'overall_success': False
-        }
+        email = user_record.email
+        result = self._new_result(email, now_iso)
 
         if not email:
             logger.error("User record missing email address")
             return result
 
-        # Prepare dataFields for users/update
-        user_data_fields = {
-            'first_name': user_record.get('first_name'),
-            'last_name': user_record.get('last_name'),
-            'plan_type': user_record.get('plan_type'),
-            'recent_page_view': True,
-            'candidate': user_record.get('candidate')
-        }
-
         # Call users/update
-        logger.info(f"Processing user: {email}")
-        update_success, update_response = self.update_user(email, user_data_fields)
+        logger.info("Processing user: %s", email)
+        update_success, update_response = self.update_user(email, self._build_user_data_fields(user_record))
         result['users_update'] = {
             'success': update_success,
             'response': update_response
         }
 
-        # Prepare dataFields for events/track
-        event_data_fields = {
-            'page': user_record.get('page'),
-            'browser': user_record.get('device'),
-            'location': user_record.get('location'),
-            'timestamp': str(user_record.get('event_time')),
-            'candidate': user_record.get('candidate')
-        }
-
         # Call events/track
         track_success, track_response = self.track_event(
             email,
             'page_view',
-            event_data_fields
+            self._build_event_data_fields(user_record)
         )
         result['events_track'] = {
             'success': track_success,
@@ -338,16 +729,510 @@ class IterableClient:
 
         # Overall success requires both calls to succeed
         result['overall_success'] = update_success and track_success
+        self._log_result(result)
 
-        if result['overall_success']:
-            logger.info(f"✓ Successfully processed user: {email}")
-        else:
-            logger.warning(f"✗ Partial failure processing user: {email}")
+        return result
+
+
+class TokenBucket:
+    """Async token-bucket rate limiter for a single Iterable endpoint"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        """
+        Initialize token bucket
+
+        Args:
+            rate: Tokens added per second (requests/second allowed)
+            capacity: Maximum burst size (default: one second worth of tokens,
+                at least one token so rates below 1/s can still acquire)
+        """
+        self.rate = rate
+        self.capacity = max(1.0, capacity or rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        """Wait until a token is available and consume it"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class AsyncIterableClient(BaseIterableClient):
+    """Asyncio client that issues Iterable API calls concurrently under per-endpoint rate limits"""
+
+    def __init__(
+        self,
+        api_key: str = None,
+        jwt_secret: str = None,
+        use_jwt: bool = False,
+        base_url: str = "https://api.iterable.com",
+        max_concurrency: int = 32,
+        max_connections: int = 128,
+        max_keepalive_connections: int = 32,
+        rate_limit: Optional[float] = None
+    ):
+        """
+        Initialize async Iterable API client
+
+        Args:
+            api_key: Iterable API key for authentication (if not using JWT)
+            jwt_secret: JWT secret for generating authentication tokens
+            use_jwt: Whether to use JWT authentication instead of API key
+            base_url: Base URL for Iterable API (default: https://api.iterable.com)
+            max_concurrency: Maximum number of API requests in flight at once
+            max_connections: Maximum open connections to the API host
+            max_keepalive_connections: Maximum idle connections kept for reuse
+            rate_limit: Optional requests/second cap applied to every endpoint,
+                below the documented per-endpoint limits
+        """
+        super().__init__(api_key=api_key, jwt_secret=jwt_secret, use_jwt=use_jwt, base_url=base_url)
+        self.max_concurrency = max_concurrency
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        
+        if rate_limit is not None:
+            self.users_update_limit = min(self.users_update_limit, rate_limit)
+            self.events_track_limit = min(self.events_track_limit, rate_limit)
+            self.users_bulk_update_limit = min(self.users_bulk_update_limit, rate_limit)
+            self.events_track_bulk_limit = min(self.events_track_bulk_limit, rate_limit)
+        
+        # Token buckets matching the per-endpoint rate limits, so bursts never
+        # reach Iterable's limit and trigger 429 backoff
+        self.users_update_limiter = TokenBucket(self.users_update_limit)
+        self.events_track_limiter = TokenBucket(self.events_track_limit)
+        self.users_bulk_update_limiter = TokenBucket(self.users_bulk_update_limit)
+        self.events_track_bulk_limiter = TokenBucket(self.events_track_bulk_limit)
+        
+        # Caps in-flight requests below the connection limits, so bursts
+        # (e.g. singleton retries for a failed bulk batch) queue here
+        # instead of timing out waiting for a pooled connection
+        self._request_slots = asyncio.Semaphore(max_concurrency)
+        
+        # Created lazily so it binds to the running event loop
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Return the shared HTTP/2 client, creating it on first use"""
+        if self._client is None or self._client.is_closed:
+            # HTTP/2 multiplexes concurrent requests over a few TLS connections
+            self._client = httpx.AsyncClient(
+                http2=True,
+                limits=httpx.Limits(
+                    max_keepalive_connections=self.max_keepalive_connections,
+                    max_connections=self.max_connections
+                ),
+                headers=self.headers,
+                timeout=10.0
+            )
+        return self._client
+
+    async def __aenter__(self) -> "AsyncIterableClient":
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        """Close the underlying HTTP client and release pooled connections"""
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+
+    async def _post(self, url: str, payload: Dict[str, Any], endpoint_name: str, limiter: TokenBucket) -> Tuple[bool, Dict[str, Any]]:
+        """
+        POST to an endpoint with rate limiting and exponential backoff retry logic
+
+        Args:
+            url: Full URL for the endpoint
+            payload: Request payload
+            endpoint_name: Name of endpoint for logging
+            limiter: Token bucket for the endpoint's rate limit
+
+        Returns:
+            Tuple of (success: bool, response_data: dict)
+        """
+        client = self._get_client()
+        last_exception = None
+        
+        for attempt in range(self.max_retries):
+            # Tokens are taken per attempt, so a waiting retry holds no rate budget
+            await limiter.acquire()
+            retry_delay = None
+            try:
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Attempt %s/%s for %s", attempt + 1, self.max_retries, endpoint_name)
+                
+                async with self._request_slots:
+                    response = await client.post(url, content=orjson.dumps(payload), headers=self._auth_header())
+                status_code = response.status_code
+                body = response.content
+                
+                # Empty 2xx replies carry nothing to inspect
+                if not body and 200 <= status_code < 300:
+                    return True, {}
+                
+                try:
+                    response_data = orjson.loads(body) if body else {}
+                except orjson.JSONDecodeError as e:
+                    logger.error("Failed to parse JSON response from %s: %s", endpoint_name, e)
+                    response_data = {'raw_response': response.text}
+                
+                # Either success or non-retryable error
+                if status_code < 400 or not self._is_retryable(status_code):
+                    return self._evaluate_response(status_code, response_data, endpoint_name)
+                
+                if attempt == self.max_retries - 1:
+                    logger.error("Max retries reached for %s", endpoint_name)
+                    return self._evaluate_response(status_code, response_data, endpoint_name)
+                
+                retry_delay = self._retry_after_delay(response.headers)
+                logger.warning(
+                    "Retryable error %s from %s. Retrying (attempt %s/%s)",
+                    status_code, endpoint_name, attempt + 1, self.max_retries
+                )
+            except httpx.TimeoutException:
+                last_exception = f"Timeout on attempt {attempt + 1}"
+                logger.warning("Timeout from %s. Attempt %s/%s", endpoint_name, attempt + 1, self.max_retries)
+            except httpx.RequestError as e:
+                last_exception = str(e)
+                logger.warning("Request exception from %s: %s. Attempt %s/%s", endpoint_name, e, attempt + 1, self.max_retries)
+            
+            if attempt < self.max_retries - 1:
+                # Prefer the wait the server asked for over our own schedule
+                if retry_delay is None:
+                    retry_delay = self._calculate_backoff(attempt)
+                await asyncio.sleep(retry_delay)
+        
+        # All retries exhausted
+        logger.error("All %s attempts failed for %s", self.max_retries, endpoint_name)
+        return False, {'error': last_exception or 'Max retries exceeded'}
+
+    async def update_user(self, email: str, data_fields: Dict[str, Any]) -> Tuple[bool, Dict[str, Any]]:
+        """
+        Update user profile in Iterable using users/update endpoint
+
+        Args:
+            email: User email address (must provide email or userId)
+            data_fields: Dictionary of user profile fields to update
+
+        Returns:
+            Tuple of (success: bool, response_data: dict)
+        """
+        payload = {
+            'email': email,
+            'dataFields': data_fields
+        }
+
+        logger.debug("Calling users/update for email: %s", email)
+        return await self._post(
+            self._users_update_url, payload, 'users/update', self.users_update_limiter
+        )
+
+    async def track_event(self, email: str, event_name: str, data_fields: Dict[str, Any]) -> Tuple[bool, Dict[str, Any]]:
+        """
+        Track event in Iterable using events/track endpoint
+
+        Args:
+            email: User email address (must provide email or userId)
+            event_name: Name of event (e.g., 'page_view')
+            data_fields: Dictionary of event-specific fields
+
+        Returns:
+            Tuple of (success: bool, response_data: dict)
+        """
+        payload = {
+            'email': email,
+            'eventName': event_name,
+            'dataFields': data_fields
+        }
+
+        logger.debug("Calling events/track for email: %s, event: %s", email, event_name)
+        return await self._post(
+            self._events_track_url, payload, 'events/track', self.events_track_limiter
+        )
+
+    async def process_user_record(self, user_record: NamedTuple, now_iso: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Process a single user record, issuing users/update and events/track concurrently
+
+        Args:
+            user_record: Record containing user and page view data from Phase 2 Query 2
+            now_iso: Processing timestamp computed once per batch by the caller
+
+        Returns:
+            Dictionary containing processing results and status
+        """
+        return await self.send_record_payloads(*self.build_record_payloads(user_record), now_iso)
+
+    async def send_record_payloads(
+        self,
+        email: Optional[str],
+        user_data_fields: Dict[str, Any],
+        event_data_fields: Dict[str, Any],
+        now_iso: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Send prebuilt users/update and events/track payloads for one user concurrently
+
+        Args:
+            email: User email address
+            user_data_fields: dataFields for users/update
+            event_data_fields: dataFields for the page_view event
+            now_iso: Processing timestamp computed once per batch by the caller
+
+        Returns:
+            Dictionary containing processing results and status
+        """
+        result = self._new_result(email, now_iso)
+
+        if not email:
+            logger.error("User record missing email address")
+            return result
+
+        logger.info("Processing user: %s", email)
+        (update_success, update_response), (track_success, track_response) = await asyncio.gather(
+            self.update_user(email, user_data_fields),
+            self.track_event(email, 'page_view', event_data_fields)
+        )
+        result['users_update'] = {
+            'success': update_success,
+            'response': update_response
+        }
+        result['events_track'] = {
+            'success': track_success,
+            'response': track_response
+        }
+
+        # Overall success requires both calls to succeed
+        result['overall_success'] = update_success and track_success
+        self._log_result(result)
 
         return result
 
+    async def update_users_bulk(self, users: List[Dict[str, Any]]) -> Tuple[bool, Dict[str, Any]]:
+        """
+        Update up to BULK_BATCH_SIZE user profiles with one users/bulkUpdate call
+
+        Args:
+            users: List of {'email': ..., 'dataFields': {...}} entries
+
+        Returns:
+            Tuple of (success: bool, response_data: dict)
+        """
+        logger.debug("Calling users/bulkUpdate for %s users", len(users))
+        return await self._post(
+            self._users_bulk_update_url, {'users': users}, 'users/bulkUpdate', self.users_bulk_update_limiter
+        )
+
+    async def track_events_bulk(self, events: List[Dict[str, Any]]) -> Tuple[bool, Dict[str, Any]]:
+        """
+        Track up to BULK_BATCH_SIZE events with one events/trackBulk call
+
+        Args:
+            events: List of {'email': ..., 'eventName': ..., 'dataFields': {...}} entries
 
-def export_results_to_csv(user_records: List[Dict[str, Any]], filename: str = None) -> str:
+        Returns:
+            Tuple of (success: bool, response_data: dict)
+        """
+        logger.debug("Calling events/trackBulk for %s events", len(events))
+        return await self._post(
+            self._events_track_bulk_url, {'events': events}, 'events/trackBulk', self.events_track_bulk_limiter
+        )
+
+    async def send_batch_payloads(
+        self,
+        payloads: List[Tuple[Optional[str], Dict[str, Any], Dict[str, Any]]],
+        now_iso: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Send a batch of users with one users/bulkUpdate and one events/trackBulk call
+
+        Users the bulk endpoints report as failed (or every user, if a bulk
+        call fails outright) are retried through the single-user endpoints.
+
+        Args:
+            payloads: (email, user dataFields, event dataFields) tuples from
+                build_record_payloads, at most BULK_BATCH_SIZE long
+            now_iso: Processing timestamp computed once per batch by the caller
+
+        Returns:
+            List of per-user processing results in the same order as payloads
+        """
+        now_iso = now_iso or datetime.now().isoformat()
+        sendable = [payload for payload in payloads if payload[0]]
+        if not sendable:
+            for _ in payloads:
+                logger.error("User record missing email address")
+            return [self._new_result(None, now_iso) for _ in payloads]
+
+        logger.info("Processing batch of %d users", len(sendable))
+        (users_ok, users_response), (events_ok, events_response) = await asyncio.gather(
+            self.update_users_bulk([
+                {'email': email, 'dataFields': user_fields} for email, user_fields, _ in sendable
+            ]),
+            self.track_events_bulk([
+                {'email': email, 'eventName': 'page_view', 'dataFields': event_fields}
+                for email, _, event_fields in sendable
+            ])
+        )
+        all_emails = {email for email, _, _ in sendable}
+        failed_users = self._failed_bulk_emails(users_response) if users_ok else all_emails
+        failed_events = self._failed_bulk_emails(events_response) if events_ok else all_emails
+
+        async def retry_singly(email: str, user_fields: Dict[str, Any], event_fields: Dict[str, Any]) -> Dict[str, Any]:
+            users_update = events_track = _BULK_SUCCESS
+            if email in failed_users:
+                success, response = await self.update_user(email, user_fields)
+                users_update = {'success': success, 'response': response}
+            if email in failed_events:
+                success, response = await self.track_event(email, 'page_view', event_fields)
+                events_track = {'success': success, 'response': response}
+            result = self._new_result(email, now_iso, users_update, events_track)
+            self._log_result(result)
+            return result
+
+        # Results stay in input (DB row) order. Users accepted by both bulk calls
+        # get their result built inline; only the failed ones pay for a
+        # coroutine and singleton requests, filled into their placeholder slot
+        batch_results = []
+        retries = []
+        for payload in payloads:
+            email = payload[0]
+            if not email:
+                logger.error("User record missing email address")
+                batch_results.append(self._new_result(None, now_iso))
+            elif email in failed_users or email in failed_events:
+                retries.append((len(batch_results), retry_singly(*payload)))
+                batch_results.append(None)
+            else:
+                batch_results.append(self._new_result(email, now_iso, _BULK_SUCCESS, _BULK_SUCCESS))
+        if retries:
+            retried = await asyncio.gather(*[coro for _, coro in retries])
+            for (index, _), result in zip(retries, retried):
+                batch_results[index] = result
+
+        return batch_results
+
+    async def process_user_records(self, user_records: List[NamedTuple]) -> List[Dict[str, Any]]:
+        """
+        Process many user records concurrently
+
+        Requests in flight are bounded by max_concurrency inside _post.
+
+        Args:
+            user_records: List of user records from Phase 2 Query 2
+
+        Returns:
+            List of processing results in the same order as user_records
+        """
+        now_iso = datetime.now().isoformat()
+        return await asyncio.gather(*[self.process_user_record(record, now_iso) for record in user_records])
+
+
+class CsvRecordWriter:
+    """Incrementally write SQL query records to a CSV file as they arrive"""
+
+    def __init__(self, filename: str = None):
+        """
+        Initialize CSV writer
+
+        Args:
+            filename: Output filename (if None, generates timestamped name)
+        """
+        if filename is None:
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            filename = f"query_results_{timestamp}.csv"
+        self.filename = filename
+        self.count = 0
+        self._file = None
+        self._writer = None
+
+    def __enter__(self) -> "CsvRecordWriter":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def writerows(self, user_records: List[NamedTuple]) -> None:
+        """
+        Append records, writing the header from the first record's columns
+
+        Args:
+            user_records: Records from Phase 2 Query 2
+        """
+        if not user_records:
+            return
+        if self._writer is None:
+            # Records are already positional tuples, so csv.writer takes them as-is;
+            # a 1 MB buffer keeps write() syscalls down on large exports
+            self._file = open(self.filename, 'w', newline='', encoding='utf-8', buffering=1 << 20)
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(user_records[0]._fields)
+        self._writer.writerows(user_records)
+        self.count += len(user_records)
+
+    def close(self) -> None:
+        """Flush and close the CSV file"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            logger.info("Exported %s records to CSV: %s", self.count, self.filename)
+        elif not self.count:
+            logger.warning("No records to export to CSV")
+
+
+class JsonlResultWriter:
+    """Incrementally append per-user processing results to a JSON Lines file"""
+
+    def __init__(self, filename: str):
+        """
+        Initialize JSON Lines writer; the file is only created once results arrive
+
+        Args:
+            filename: Output filename
+        """
+        self.filename = filename
+        self.count = 0
+        self._file = None
+
+    def __enter__(self) -> "JsonlResultWriter":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def writerows(self, results: List[Dict[str, Any]]) -> None:
+        """
+        Append results as compact JSON, one per line
+
+        Args:
+            results: Per-user processing results
+        """
+        if not results:
+            return
+        if self._file is None:
+            # Appended through a 1 MB buffer so each batch reaches the OS in few writes
+            self._file = open(self.filename, 'ab', buffering=1 << 20)
+        self._file.write(b''.join(
+            orjson.dumps(result, option=orjson.OPT_APPEND_NEWLINE) for result in results
+        ))
+        self.count += len(results)
+
+    def close(self) -> None:
+        """Flush and close the results file"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def export_results_to_csv(user_records: List[NamedTuple], filename: str = None) -> str:
     """
     Export SQL query results to CSV file
 
@@ -358,26 +1243,10 @@ def export_results_to_csv(user_records: List[Dict[str, Any]], filename: str = No
     Returns:
         Path to the generated CSV file
     """
-    if filename is None:
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"query_results_{timestamp}.csv"
-    
-    if not user_records:
-        logger.warning("No records to export to CSV")
-        return filename
-    
     try:
-        # Get all keys from first record to use as headers
-        fieldnames = list(user_records[0].keys())
-        
-        with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            writer.writeheader()
+        with CsvRecordWriter(filename) as writer:
             writer.writerows(user_records)
-        
-        logger.info(f"Exported {len(user_records)} records to CSV: {filename}")
-        return filename
+        return writer.filename
     except Exception as e:
-        logger.error(f"Failed to export results to CSV: {e}")
+        logger.error("Failed to export results to CSV: %s", e)
         raise
-
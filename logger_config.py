@@ -1,12 +1,18 @@
 """
 Logging Configuration Module
 Sets up console and file-based logging for Iterable integration
+Handlers run on a background QueueListener thread so log I/O stays off the hot path
 """
 
+import atexit
 import logging
+import queue
 import sys
-from logging.handlers import RotatingFileHandler
-from typing import Optional
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict, Optional
+
+# Active queue listeners by logger name, so reconfiguring stops the old thread
+_listeners: Dict[str, QueueListener] = {}
 
 
 def setup_logger(
@@ -17,6 +23,9 @@ def setup_logger(
     """
     Configure logging with both console and file handlers
 
+    The logger itself only enqueues records; a QueueListener thread formats
+    them and writes to the console and file handlers.
+
     Args:
         name: Logger name (typically __name__)
         log_file: Path to log file
@@ -35,6 +44,11 @@ def setup_logger(
     
     # Remove existing handlers to avoid duplicates
     logger.handlers = []
+    previous_listener = _listeners.pop(name, None)
+    if previous_listener is not None:
+        atexit.unregister(previous_listener.stop)
+        previous_listener.stop()
+    handlers = []
     
     # Create formatters
     detailed_formatter = logging.Formatter(
@@ -46,9 +60,10 @@ def setup_logger(
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(logging.INFO)
     console_handler.setFormatter(detailed_formatter)
-    logger.addHandler(console_handler)
+    handlers.append(console_handler)
     
     # File handler - DEBUG level and above with rotation
+    file_handler_error = None
     try:
         file_handler = RotatingFileHandler(
             log_file,
@@ -57,9 +72,20 @@ def setup_logger(
         )
         file_handler.setLevel(logging.DEBUG)
         file_handler.setFormatter(detailed_formatter)
-        logger.addHandler(file_handler)
+        handlers.append(file_handler)
     except Exception as e:
-        logger.warning(f"Could not create file handler for {log_file}: {e}")
+        file_handler_error = e
+    
+    # Hand records to a background thread instead of writing inline
+    log_queue = queue.Queue(-1)
+    logger.addHandler(QueueHandler(log_queue))
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    _listeners[name] = listener
+    
+    if file_handler_error is not None:
+        logger.warning("Could not create file handler for %s: %s", log_file, file_handler_error)
     
     return logger
 
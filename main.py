@@ -5,21 +5,120 @@ Orchestrates database queries and Iterable API calls with error handling and log
 
 import os
 import sys
-import json
-from typing import Dict, Any, List
+import asyncio
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Dict, Any, Iterator, List
 from dotenv import load_dotenv
 from datetime import datetime
 
 # Import modules
 from db_connection import DatabaseConnection
-from iterable_client import IterableClient, export_results_to_csv
+from iterable_client import AsyncIterableClient, CsvRecordWriter, JsonlResultWriter, BULK_BATCH_SIZE
 from logger_config import setup_logger, get_logger
 
+# Required vars (DB_PASSWORD can be empty for local MySQL without password)
+REQUIRED_ENV_VARS = (
+    'DB_HOST',
+    'DB_USER',
+    'DB_NAME',
+    'ITERABLE_API_KEY'
+)
+
+# Optional vars and their defaults (None means no default)
+OPTIONAL_ENV_VARS = {
+    'DB_PASSWORD': '',
+    'DB_POOL_SIZE': '25',
+    'ITERABLE_API_BASE_URL': 'https://api.iterable.com',
+    'ITERABLE_JWT_SECRET': None,
+    'ITERABLE_RATE_LIMIT': None,
+    'MAX_CONCURRENCY': '32',
+    'USE_JWT_AUTH': 'false',
+    'LOG_LEVEL': 'INFO',
+    'LOG_FILE': 'iterable_integration.log'
+}
+
+# Bulk batches in flight at once; users/bulkUpdate allows only 5 requests/second
+BULK_DISPATCHERS = 4
+
+# Blocking DB reads and CSV writes run on one dedicated thread, off the event
+# loop and out of the default executor. A single thread is deliberate: batches
+# are read one at a time from one shared cursor iterator, which must not be
+# advanced from several threads
+DB_READER_THREADS = 1
+
+# Log separators, built once
+_BANNER = "=" * 70
+_RULE = "-" * 70
+
+# Environment values read once; use ENV.get() instead of os.getenv()
+ENV: Dict[str, str] = {}
+
+
+def refresh_environment_cache() -> Dict[str, str]:
+    """
+    Re-read all known environment variables into the ENV cache in one pass
+
+    Returns:
+        The refreshed ENV dictionary
+    """
+    ENV.clear()
+    for var in REQUIRED_ENV_VARS:
+        value = os.environ.get(var)
+        if value:
+            ENV[var] = value
+    for var, default in OPTIONAL_ENV_VARS.items():
+        value = os.environ.get(var, default)
+        if value is not None:
+            ENV[var] = value
+    return ENV
+
+
 # Initialize logger
 load_dotenv()
-log_level = os.getenv('LOG_LEVEL', 'INFO')
-log_file = os.getenv('LOG_FILE', 'iterable_integration.log')
-logger = setup_logger(__name__, log_file=log_file, log_level=log_level)
+refresh_environment_cache()
+logger = setup_logger(__name__, log_file=ENV['LOG_FILE'], log_level=ENV['LOG_LEVEL'])
+
+
+def _invalid_numeric_vars(env_vars: Dict[str, str]) -> List[str]:
+    """
+    Check that numeric environment variables parse and are in range
+
+    Args:
+        env_vars: Environment values from the ENV cache
+
+    Returns:
+        Error messages for invalid values (empty if all are valid)
+    """
+    errors = []
+    pool_size = env_vars['DB_POOL_SIZE']
+    try:
+        valid = 1 <= int(pool_size) <= 32
+    except ValueError:
+        valid = False
+    if not valid:
+        # mysql-connector rejects pools outside 1..32 with an AttributeError
+        errors.append(f"DB_POOL_SIZE must be an integer from 1 to 32 (got {pool_size!r})")
+    
+    max_concurrency = env_vars['MAX_CONCURRENCY']
+    try:
+        valid = int(max_concurrency) >= 1
+    except ValueError:
+        valid = False
+    if not valid:
+        # Semaphore(0) would never let a request through
+        errors.append(f"MAX_CONCURRENCY must be an integer of at least 1 (got {max_concurrency!r})")
+    
+    rate_limit = env_vars.get('ITERABLE_RATE_LIMIT')
+    if rate_limit:
+        try:
+            valid = float(rate_limit) > 0
+        except ValueError:
+            valid = False
+        if not valid:
+            errors.append(f"ITERABLE_RATE_LIMIT must be a number greater than 0 (got {rate_limit!r})")
+    return errors
 
 
 def load_environment_variables() -> Dict[str, str]:
@@ -29,52 +128,171 @@ def load_environment_variables() -> Dict[str, str]:
     Returns:
         Dictionary of environment variables
     """
-    # Required vars (DB_PASSWORD can be empty for local MySQL without password)
-    required_vars = [
-        'DB_HOST',
-        'DB_USER',
-        'DB_NAME',
-        'ITERABLE_API_KEY'
-    ]
-    
-    env_vars = {}
-    missing_vars = []
-    
-    for var in required_vars:
-        value = os.getenv(var)
-        if not value:
-            missing_vars.append(var)
-        else:
-            env_vars[var] = value
-    
-    # DB_PASSWORD is optional (can be empty for local MySQL without password)
-    env_vars['DB_PASSWORD'] = os.getenv('DB_PASSWORD', '')
+    env_vars = refresh_environment_cache()
+    missing_vars = [var for var in REQUIRED_ENV_VARS if var not in env_vars]
     
     if missing_vars:
-        logger.error(f"Missing required environment variables: {', '.join(missing_vars)}")
+        logger.error("Missing required environment variables: %s", ', '.join(missing_vars))
         logger.error("Please ensure .env file is configured with all required variables")
         sys.exit(1)
     
+    invalid_vars = _invalid_numeric_vars(env_vars)
+    if invalid_vars:
+        for message in invalid_vars:
+            logger.error("Invalid environment variable: %s", message)
+        sys.exit(1)
+    
     logger.info("Environment variables loaded successfully")
     return env_vars
 
 
+def _summarize_outcomes(results: Dict[str, Any], outcomes: Counter) -> None:
+    """
+    Fold (users_update ok, events_track ok) outcome counts into the results summary
+
+    Args:
+        results: Results counters updated in place
+        outcomes: Counter keyed by (users_update success, events_track success)
+    """
+    results['successful'] += outcomes[True, True]
+    results['partial_failures'] += outcomes[True, False] + outcomes[False, True]
+    results['total_failures'] += outcomes[False, False]
+
+
+async def _gather_or_cancel(coros: List[Any]) -> None:
+    """
+    Run coroutines concurrently; if one fails (or the caller is cancelled), cancel the rest
+
+    Unlike a bare asyncio.gather, no sibling is left running, blocked on a
+    queue whose other end has gone away.
+
+    Args:
+        coros: Coroutines to run as tasks
+    """
+    tasks = [asyncio.ensure_future(coro) for coro in coros]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+async def _run_pipeline_async(
+    iterable_client: AsyncIterableClient,
+    user_records: Iterator[Any],
+    csv_writer: CsvRecordWriter,
+    results: Dict[str, Any],
+    results_writer: JsonlResultWriter,
+    batch_size: int = BULK_BATCH_SIZE
+) -> None:
+    """
+    Run the DB → payload → HTTP → results stage graph over streamed user records
+
+    Stages are connected by bounded queues so each one overlaps the others:
+      1. DB stream: pull batches from the blocking DB iterator on a dedicated
+         reader thread, append them to the CSV export and queue them
+      2. Payload build: turn each row into users/update and events/track dataFields
+      3. HTTP dispatch: send each batch via users/bulkUpdate and events/trackBulk,
+         retrying failed users through the single-user endpoints
+      4. Aggregation: count per-user outcomes and append each result to the
+         JSON Lines results file (this is the only task writing to it)
+
+    Args:
+        iterable_client: Async Iterable API client
+        user_records: Streaming iterator of user records from Phase 2 Query 2
+        csv_writer: CSV export the records are appended to as they stream
+        results: Results counters updated in place
+        results_writer: JSON Lines writer receiving one result per line
+        batch_size: Rows per bulk API batch
+    """
+    loop = asyncio.get_running_loop()
+    db_queue: asyncio.Queue = asyncio.Queue(maxsize=4)
+    api_queue: asyncio.Queue = asyncio.Queue(maxsize=4)
+    result_queue: asyncio.Queue = asyncio.Queue(maxsize=4)
+
+    def read_batch() -> List[Any]:
+        batch = list(islice(user_records, batch_size))
+        csv_writer.writerows(batch)
+        return batch
+
+    async def stream_rows() -> None:
+        with ThreadPoolExecutor(max_workers=DB_READER_THREADS, thread_name_prefix='db-reader') as executor:
+            while True:
+                batch = await loop.run_in_executor(executor, read_batch)
+                if not batch:
+                    return
+                results['total_users'] += len(batch)
+                await db_queue.put(batch)
+
+    async def build_payloads() -> None:
+        while True:
+            batch = await db_queue.get()
+            if batch is None:
+                return
+            await api_queue.put([iterable_client.build_record_payloads(user_record) for user_record in batch])
+
+    async def dispatch() -> None:
+        while True:
+            payloads = await api_queue.get()
+            if payloads is None:
+                return
+            # Each batch is stamped when it is dispatched, not when the run started
+            now_iso = datetime.now().isoformat()
+            await result_queue.put(await iterable_client.send_batch_payloads(payloads, now_iso))
+
+    async def aggregate() -> None:
+        # Only success pairs are counted per user; buckets are derived once at the end
+        outcomes: Counter = Counter()
+        while True:
+            batch_results = await result_queue.get()
+            if batch_results is None:
+                _summarize_outcomes(results, outcomes)
+                return
+            outcomes.update(
+                (bool(r['users_update']['success']), bool(r['events_track']['success']))
+                for r in batch_results
+            )
+            results_writer.writerows(batch_results)
+
+    async def stage(workers: List[Any], downstream: asyncio.Queue, downstream_workers: int) -> None:
+        # Once every worker in a stage is done, send one sentinel per downstream worker.
+        # Failures skip this: the whole graph is cancelled below, and a put into a
+        # full queue whose consumer is gone would block forever
+        await _gather_or_cancel(workers)
+        for _ in range(downstream_workers):
+            await downstream.put(None)
+
+    async with iterable_client:
+        await _gather_or_cancel([
+            stage([stream_rows()], db_queue, 1),
+            stage([build_payloads()], api_queue, BULK_DISPATCHERS),
+            stage([dispatch() for _ in range(BULK_DISPATCHERS)], result_queue, 1),
+            aggregate()
+        ])
+
+
 def run_integration():
     """
     Main integration workflow:
     1. Load configuration from .env
     2. Connect to database
-    3. Execute Phase 2 Query 2 to get pro users with recent engagement
-    4. For each user, make users/update and events/track API calls to Iterable
+    3. Stream Phase 2 Query 2 to get pro users with recent engagement
+    4. Send users/bulkUpdate and events/trackBulk calls to Iterable in batches
+       of up to 1000 users as rows arrive from the database
     5. Log all results
     """
     
-    logger.info("=" * 70)
+    logger.info(_BANNER)
     logger.info("Starting Iterable Integration - Phase 3")
-    logger.info("=" * 70)
+    logger.info(_BANNER)
     
     # Step 1: Load environment variables
     logger.info("\n[STEP 1] Loading environment variables...")
+    # One run timestamp names every output file
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    results_file = f"integration_results_{timestamp}.jsonl"
     try:
         env_vars = load_environment_variables()
     except SystemExit:
@@ -86,103 +304,100 @@ def run_integration():
         host=env_vars['DB_HOST'],
         user=env_vars['DB_USER'],
         password=env_vars['DB_PASSWORD'],
-        database=env_vars['DB_NAME']
+        database=env_vars['DB_NAME'],
+        pool_size=int(env_vars['DB_POOL_SIZE'])
     )
     
     if not db.connect():
         logger.error("Failed to connect to database. Exiting.")
         return
     
-    # Step 3: Execute Phase 2 Query 2
-    logger.info("\n[STEP 3] Executing Phase 2 Query 2: Get pro users with recent engagement...")
-    user_records = db.get_pro_users_recent_engagement()
-    
-    if not user_records:
-        logger.warning("No pro users with recent pricing/settings page views found")
-        db.disconnect()
-        return
-    
-    logger.info(f"Found {len(user_records)} pro user(s) with recent engagement")
+    # Step 3: Stream Phase 2 Query 2; rows are read ahead while the client starts up
+    logger.info("\n[STEP 3] Streaming Phase 2 Query 2: Get pro users with recent engagement...")
+    user_records = db.iter_pro_users_recent_engagement(batch_size=BULK_BATCH_SIZE)
     
     # Step 4: Initialize Iterable client with JWT or API key
     logger.info("\n[STEP 4] Initializing Iterable API client...")
-    use_jwt = os.getenv('USE_JWT_AUTH', 'false').lower() == 'true'
-    jwt_secret = os.getenv('ITERABLE_JWT_SECRET')
+    use_jwt = env_vars['USE_JWT_AUTH'].lower() == 'true'
+    jwt_secret = env_vars.get('ITERABLE_JWT_SECRET')
+    rate_limit = env_vars.get('ITERABLE_RATE_LIMIT')
     
-    iterable_client = IterableClient(
+    iterable_client = AsyncIterableClient(
         api_key=env_vars['ITERABLE_API_KEY'],
         jwt_secret=jwt_secret,
         use_jwt=use_jwt,
-        base_url=os.getenv('ITERABLE_API_BASE_URL', 'https://api.iterable.com')
+        base_url=env_vars['ITERABLE_API_BASE_URL'],
+        max_concurrency=int(env_vars['MAX_CONCURRENCY']),
+        rate_limit=float(rate_limit) if rate_limit else None
     )
     logger.info("Iterable API client initialized")
+    logger.info(
+        "Rate limits: users/bulkUpdate %s/s, events/trackBulk %s/s "
+        "(single-user retries: users/update %s/s, events/track %s/s)",
+        iterable_client.users_bulk_update_limit, iterable_client.events_track_bulk_limit,
+        iterable_client.users_update_limit, iterable_client.events_track_limit
+    )
+    logger.info("Max concurrent API requests: %d", iterable_client.max_concurrency)
     
     # Step 4.5: Export query results to CSV (Bonus Feature)
-    logger.info("\n[STEP 4.5] Exporting query results to CSV...")
-    csv_file = export_results_to_csv(user_records)
-    logger.info(f"Query results exported to: {csv_file}")
+    logger.info("\n[STEP 4.5] Exporting query results to CSV as they stream...")
+    csv_writer = CsvRecordWriter(f"query_results_{timestamp}.csv")
     
     # Step 5: Process each user record
     logger.info("\n[STEP 5] Processing user records...")
-    logger.info("-" * 70)
+    logger.info(_RULE)
     
     results = {
-        'total_users': len(user_records),
+        'total_users': 0,
         'successful': 0,
         'partial_failures': 0,
-        'total_failures': 0,
-        'records': []
+        'total_failures': 0
     }
     
-    for index, user_record in enumerate(user_records, 1):
-        logger.info(f"\nProcessing record {index}/{len(user_records)}")
-        
-        # Process user and make API calls
-        process_result = iterable_client.process_user_record(user_record)
-        results['records'].append(process_result)
-        
-        # Update statistics
-        if process_result['overall_success']:
-            results['successful'] += 1
-        elif process_result['users_update']['success'] or process_result['events_track']['success']:
-            results['partial_failures'] += 1
-        else:
-            results['total_failures'] += 1
-    
-    # Step 6: Disconnect and summarize
-    logger.info("\n" + "-" * 70)
-    logger.info("\n[STEP 6] Generating summary report...")
+    # DB streaming, payload building and API calls run as overlapping stages;
+    # the results file is only created once the first batch of results arrives
+    results_writer = JsonlResultWriter(results_file)
+    try:
+        with csv_writer, results_writer:
+            asyncio.run(_run_pipeline_async(iterable_client, user_records, csv_writer, results, results_writer))
+    finally:
+        # Stop the prefetch thread (releasing its pooled connection and open
+        # cursor) and close the pool even if a pipeline stage failed
+        user_records.close()
+        db.disconnect()
+    csv_file = csv_writer.filename
+    total_users = results['total_users']
     
-    db.disconnect()
+    if not total_users:
+        logger.warning("No pro users with recent pricing/settings page views found")
+        return
+    
+    logger.info("Found %d pro user(s) with recent engagement", total_users)
+    logger.info("Query results exported to: %s", csv_file)
+    
+    # Step 6: Summarize
+    logger.info("\n%s", _RULE)
+    logger.info("\n[STEP 6] Generating summary report...")
     
     # Log retry configuration
-    logger.info(f"\nRetry Configuration:")
-    logger.info(f"  Max Retries: {iterable_client.max_retries}")
-    logger.info(f"  Initial Backoff: {iterable_client.initial_backoff}s")
-    logger.info(f"  Backoff Factor: {iterable_client.backoff_factor}x (exponential)")
+    logger.info("\nRetry Configuration:")
+    logger.info("  Max Retries: %d", iterable_client.max_retries)
+    logger.info("  Initial Backoff: %ss", iterable_client.initial_backoff)
+    logger.info("  Backoff Factor: %sx (exponential)", iterable_client.backoff_factor)
+    logger.info("  Max Backoff: %ss (Retry-After honored)", iterable_client.max_backoff)
     
     # Log summary
-    logger.info("\n" + "=" * 70)
+    logger.info("\n%s", _BANNER)
     logger.info("INTEGRATION SUMMARY")
-    logger.info("=" * 70)
-    logger.info(f"Total users processed: {results['total_users']}")
-    logger.info(f"✓ Successful (both API calls): {results['successful']}")
-    logger.info(f"⚠ Partial failures (one call failed): {results['partial_failures']}")
-    logger.info(f"✗ Total failures (both calls failed): {results['total_failures']}")
-    logger.info(f"✓ CSV Export: {csv_file}")
-    logger.info(f"✓ Authentication: {'JWT' if use_jwt else 'API Key'}")
-    logger.info("=" * 70)
-    
-    # Save detailed results to JSON file
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    results_file = f"integration_results_{timestamp}.json"
-    
-    try:
-        with open(results_file, 'w') as f:
-            json.dump(results, f, indent=2, default=str)
-        logger.info(f"\nDetailed results saved to: {results_file}")
-    except Exception as e:
-        logger.error(f"Failed to save results to file: {e}")
+    logger.info(_BANNER)
+    logger.info("Total users processed: %d", total_users)
+    logger.info("✓ Successful (both API calls): %d", results['successful'])
+    logger.info("⚠ Partial failures (one call failed): %d", results['partial_failures'])
+    logger.info("✗ Total failures (both calls failed): %d", results['total_failures'])
+    logger.info("✓ CSV Export: %s", csv_file)
+    logger.info("✓ Authentication: %s", 'JWT' if use_jwt else 'API Key')
+    logger.info(_BANNER)
+    logger.info("\nDetailed results saved to: %s", results_file)
     
     logger.info("\nIntegration complete!")
 
@@ -195,7 +410,7 @@ def main():
         logger.info("\n\nIntegration interrupted by user")
         sys.exit(0)
     except Exception as e:
-        logger.exception(f"Unexpected error during integration: {e}")
+        logger.exception("Unexpected error during integration: %s", e)
         sys.exit(1)
 
 
@@ -0,0 +1,69 @@
+"""
+Tests for db_connection.PrefetchingIterator
+
+Run from the project root: python -m unittest discover -s tests -t .
+"""
+
+import threading
+import unittest
+from itertools import islice
+
+try:
+    from db_connection import PrefetchingIterator
+except ImportError:  # mysql-connector-python not installed
+    PrefetchingIterator = None
+
+
+def _read_batches(source, batch_size, timeout=3.0):
+    """Drain source in islice batches on a worker thread, failing instead of hanging"""
+    batches = []
+
+    def drain():
+        while True:
+            batch = list(islice(source, batch_size))
+            batches.append(batch)
+            if not batch:
+                return
+
+    worker = threading.Thread(target=drain, daemon=True)
+    worker.start()
+    worker.join(timeout)
+    if worker.is_alive():
+        raise AssertionError(f"read blocked after batches of sizes {[len(b) for b in batches]}")
+    return batches
+
+
+@unittest.skipIf(PrefetchingIterator is None, "mysql-connector-python is not installed")
+class PrefetchingIteratorTest(unittest.TestCase):
+
+    def test_partial_final_batch(self):
+        batches = _read_batches(PrefetchingIterator(iter(range(700)), chunk_size=500), 500)
+        self.assertEqual([len(b) for b in batches], [500, 200, 0])
+        self.assertEqual([row for batch in batches for row in batch], list(range(700)))
+
+    def test_exact_multiple_of_batch_size(self):
+        batches = _read_batches(PrefetchingIterator(iter(range(1000)), chunk_size=500), 500)
+        self.assertEqual([len(b) for b in batches], [500, 500, 0])
+
+    def test_batches_smaller_than_chunks(self):
+        batches = _read_batches(PrefetchingIterator(iter(range(250)), chunk_size=100), 60)
+        self.assertEqual([len(b) for b in batches], [60, 60, 60, 60, 10, 0])
+
+    def test_stays_exhausted(self):
+        rows = PrefetchingIterator(iter(range(3)), chunk_size=2)
+        self.assertEqual(list(rows), [0, 1, 2])
+        self.assertEqual(_read_batches(rows, 10), [[]])
+
+    def test_source_error_is_raised_then_exhausted(self):
+        def failing():
+            yield 1
+            raise ValueError("lost connection")
+
+        rows = PrefetchingIterator(failing(), chunk_size=10)
+        with self.assertRaises(ValueError):
+            list(rows)
+        self.assertEqual(_read_batches(rows, 10), [[]])
+
+
+if __name__ == '__main__':
+    unittest.main()